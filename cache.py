@@ -0,0 +1,42 @@
+"""
+In-process TTL Cache
+
+Small TTL cache for read-mostly async endpoints. Entries are keyed on the
+call arguments plus a version counter; write paths call `invalidate()` to
+bump the version so stale entries simply stop matching.
+"""
+
+import functools
+import time
+
+from starlette.responses import Response
+
+def ttl_cache(ttl: int = 60, maxsize: int = 1024):
+    """Decorate an async function with a TTL-and-version keyed cache"""
+    def decorator(func):
+        store = {}
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())), wrapper.version)
+            now = time.monotonic()
+            hit = store.get(key)
+            if hit is not None and hit[1] > now:
+                return hit[0]
+            value = await func(*args, **kwargs)
+            # Response objects (e.g. streamed bodies) are single-use; pass
+            # them through without caching
+            if not isinstance(value, Response):
+                if len(store) >= maxsize:
+                    store.clear()
+                store[key] = (value, now + ttl)
+            return value
+
+        def invalidate():
+            wrapper.version += 1
+            store.clear()
+
+        wrapper.version = 0
+        wrapper.invalidate = invalidate
+        return wrapper
+    return decorator
@@ -0,0 +1,80 @@
+"""
+Query Coalescer
+
+Micro-batches concurrent read queries: identical finds queued while a batch
+is in flight share a single MongoDB round-trip instead of each paying their
+own (single-flight — a lone request dispatches immediately, never waiting
+for stragglers). Use it from async endpoints via `await coalescer.fetch(...)`.
+"""
+
+import asyncio
+import json
+
+from database import get_documents
+
+MAX_BATCH = 32
+
+class QueryCoalescer:
+    def __init__(self, max_batch: int = MAX_BATCH):
+        self.max_batch = max_batch
+        self._queue = None
+        self._task = None
+
+    def _ensure_started(self):
+        # Lazily start the collector on the running loop (there is none at import time)
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    @staticmethod
+    def _key(collection_name: str, filter_dict: dict, limit, sort, projection):
+        return (
+            collection_name,
+            json.dumps(filter_dict or {}, sort_keys=True, default=str),
+            limit,
+            json.dumps(sort, default=str),
+            json.dumps(projection, sort_keys=True, default=str),
+        )
+
+    async def fetch(self, collection_name: str, filter_dict: dict = None, limit: int = None, sort: list = None, projection: dict = None):
+        """Queue a find and wait for the batched result"""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        key = self._key(collection_name, filter_dict, limit, sort, projection)
+        await self._queue.put((key, (collection_name, filter_dict, limit, sort, projection), future))
+        return await future
+
+    async def _run(self):
+        while True:
+            # Block for the first request, then drain whatever is already
+            # queued and dispatch immediately — no sleeping for stragglers.
+            # Requests arriving while this batch is in flight queue up and
+            # coalesce into the next one.
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            # Group identical queries so each shape hits the DB exactly once
+            groups = {}
+            for key, query, future in batch:
+                groups.setdefault(key, (query, []))[1].append(future)
+
+            queries = [query for query, _ in groups.values()]
+            results = await asyncio.gather(
+                *(
+                    get_documents(coll, filt, limit, sort=sort, projection=projection)
+                    for coll, filt, limit, sort, projection in queries
+                ),
+                return_exceptions=True,
+            )
+            for (_, futures), result in zip(groups.values(), results):
+                for future in futures:
+                    if future.cancelled():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        # Copy per caller: endpoints mutate docs (e.g. popping _id)
+                        future.set_result([dict(d) for d in result])
+
+coalescer = QueryCoalescer()
@@ -1,17 +1,20 @@
 """
 Database Helper Functions
 
-MongoDB helper functions ready to use in your backend code.
+Async MongoDB helper functions (Motor) ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
 from typing import Union
 from pydantic import BaseModel
 
+from schemas import product_search_tokens
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -21,12 +24,64 @@ db = None
 database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
+# Exactly one client for the whole process: connections are pooled and
+# reused, so endpoints never pay per-request TCP/TLS handshakes
 if database_url and database_name:
-    _client = MongoClient(database_url)
+    _client = AsyncIOMotorClient(
+        database_url,
+        maxPoolSize=100,
+        minPoolSize=20,
+        maxIdleTimeMS=60000,
+        serverSelectionTimeoutMS=2000,
+        # Wire compression: the driver negotiates the first compressor the
+        # server also supports and silently skips unavailable ones
+        compressors="zstd,snappy,zlib",
+        zlibCompressionLevel=3,
+    )
     db = _client[database_name]
 
+def close():
+    """Close the shared client and its connection pool on shutdown"""
+    if _client is not None:
+        _client.close()
+
+async def ping():
+    """Ping the server to prewarm the connection pool on startup"""
+    if _client is not None:
+        await _client.admin.command("ping")
+
+async def ensure_indexes():
+    """Create the indexes the API queries rely on (no-op if they exist)"""
+    if db is None:
+        return
+    # Text index so product search uses token seeks instead of $regex scans
+    await db.product.create_index(
+        [("title", "text"), ("description", "text"), ("tags", "text")],
+        weights={"title": 10, "tags": 5, "description": 1},
+    )
+    # Secondary order lookup field used by shipment tracking
+    await db.order.create_index("tracking_number")
+    # Compound/single-field indexes matching the hot query shapes
+    await db.product.create_index([("active", 1), ("category", 1)], background=True)
+    await db.product.create_index([("sku", 1)], unique=True, background=True)
+    await db.product.create_index([("tags", 1)], background=True)
+    await db.product.create_index([("brand", 1)], background=True)
+    await db.product.create_index([("search_tokens", 1)], background=True)
+    # One-time backfill: products written before search_tokens existed would
+    # otherwise be invisible to single-token search
+    updates = []
+    async for doc in db.product.find({"search_tokens": {"$exists": False}}, {"title": 1, "description": 1, "tags": 1}):
+        tokens = product_search_tokens(doc.get("title", ""), doc.get("description"), doc.get("tags"))
+        updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"search_tokens": tokens}}))
+    if updates:
+        await db.product.bulk_write(updates, ordered=False)
+    await db.promocode.create_index([("code", 1), ("active", 1)], background=True)
+    await db.blogpost.create_index([("published", 1), ("created_at", -1)], background=True)
+    # Keyed lookups and upserts into the precomputed similarity table
+    await db.sku_similar.create_index([("sku", 1)], unique=True, background=True)
+
 # Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
+async def create_document(collection_name: str, data: Union[BaseModel, dict]):
     """Insert a single document with timestamp"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
@@ -40,16 +95,50 @@ def create_document(collection_name: str, data: Union[BaseModel, dict]):
     data_dict['created_at'] = datetime.now(timezone.utc)
     data_dict['updated_at'] = datetime.now(timezone.utc)
 
-    result = db[collection_name].insert_one(data_dict)
+    result = await db[collection_name].insert_one(data_dict)
     return str(result.inserted_id)
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
-    """Get documents from collection"""
+async def aggregate(collection_name: str, pipeline: list, limit: int = None):
+    """Run an aggregation pipeline and return the result documents"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    return await db[collection_name].aggregate(pipeline).to_list(limit)
+
+async def find_one(collection_name: str, filter_dict: dict = None, projection: dict = None):
+    """Get a single document (or None) without a cursor round-trip"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    return await db[collection_name].find_one(filter_dict or {}, projection)
+
+async def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None, sort: list = None, projection: dict = None):
+    """Get documents from collection (without _id unless a projection asks for it)"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
-    
-    cursor = db[collection_name].find(filter_dict or {})
+
+    if projection is None:
+        # Callers return plain JSON; skip _id server-side so nothing has to
+        # strip ObjectIds in Python afterwards
+        projection = {"_id": 0}
+    cursor = db[collection_name].find(filter_dict or {}, projection)
+    if sort:
+        cursor = cursor.sort(sort)
     if limit:
         cursor = cursor.limit(limit)
-    
-    return list(cursor)
+        return await cursor.to_list(limit)
+
+    return await cursor.to_list(None)
+
+def stream_documents(collection_name: str, filter_dict: dict = None, limit: int = None, sort: list = None, projection: dict = None):
+    """Get an async-iterable cursor instead of buffering results in a list"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    cursor = db[collection_name].find(filter_dict or {}, projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    if limit:
+        cursor = cursor.limit(limit)
+
+    return cursor
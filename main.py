@@ -1,12 +1,81 @@
+import asyncio
 import os
+import re
+from bson.regex import Regex
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse, StreamingResponse
+import orjson
+from pydantic import BaseModel, TypeAdapter
 from typing import List, Optional
-from database import db, create_document, get_documents
-from schemas import Product, Order, Wishlist, PromoCode, BlogPost, Event, Newsletter, RecommendationFeedback
+import database
+from database import db, create_document, get_documents, find_one, aggregate, ping, ensure_indexes, stream_documents
+from coalescer import coalescer
+from writer import writer
+from cache import ttl_cache
+from recommendations import similarity_refresher
+from schemas import Product, Order, Wishlist, PromoCode, BlogPost, Event, Newsletter, RecommendationFeedback, product_search_tokens
 
-app = FastAPI(title="Pikalba API", version="0.1.0")
+app = FastAPI(title="Pikalba API", version="0.1.0", default_response_class=ORJSONResponse)
+
+# Module-level adapters: built once, reused every request, far cheaper than
+# FastAPI's per-route response_model machinery
+PRODUCT_LIST = TypeAdapter(List[Product])
+BLOG_LIST = TypeAdapter(List[BlogPost])
+EVENT_LIST = TypeAdapter(List[Event])
+
+# Pages larger than this are streamed straight off the cursor rather than
+# buffered, cached, and serialized in one shot
+STREAM_THRESHOLD = 100
+
+def stream_json_array(cursor):
+    """Stream a cursor as a JSON array, overlapping fetch with client send"""
+    async def gen():
+        first = True
+        yield b"["
+        async for doc in cursor:
+            if not first:
+                yield b","
+            first = False
+            yield orjson.dumps(doc)
+        yield b"]"
+    return StreamingResponse(gen(), media_type="application/json")
+
+# List views only need display fields; project out heavy ones (description,
+# variants, all-but-first image) so they never cross the wire
+PRODUCT_LIST_PROJECTION = {
+    "_id": 0,
+    "sku": 1,
+    "title": 1,
+    "price": 1,
+    "currency": 1,
+    "images": {"$slice": 1},
+    "category": 1,
+    "brand": 1,
+    "active": 1,
+}
+
+# Explicit model-field projections so streamed responses (which bypass the
+# TypeAdapter) carry exactly the same shape as buffered ones — no
+# updated_at or other stray DB fields
+BLOG_LIST_PROJECTION = {
+    "_id": 0,
+    "title": 1,
+    "slug": 1,
+    "content": 1,
+    "cover_image": 1,
+    "tags": 1,
+    "published": 1,
+    "created_at": 1,
+}
+EVENT_LIST_PROJECTION = {
+    "_id": 0,
+    "title": 1,
+    "date": 1,
+    "location": 1,
+    "description": 1,
+    "link": 1,
+}
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,36 +85,81 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup():
+    # Prewarm the connection pool so the first request doesn't pay the handshake
+    if db is not None:
+        await ping()
+        await ensure_indexes()
+        # Keep the reference: an unreferenced task can be garbage-collected
+        # and the refresher would silently stop
+        app.state.similarity_task = asyncio.create_task(similarity_refresher())
+
+@app.on_event("shutdown")
+async def shutdown():
+    task = getattr(app.state, "similarity_task", None)
+    if task is not None:
+        task.cancel()
+    # Flush acked-but-unwritten batched inserts before dropping the pool
+    await writer.flush()
+    database.close()
+
 @app.get("/")
-def root():
+async def root():
     return {"name": "Pikalba", "status": "ok"}
 
 # --------- Catalog Endpoints ---------
 
-@app.get("/api/products", response_model=List[Product])
-def list_products(category: Optional[str] = None, q: Optional[str] = None, limit: int = 50):
+# Read endpoints return trusted, projected DB content, so skip the
+# response_model revalidation pass FastAPI would otherwise run per request
+@app.get("/api/products")
+@ttl_cache(ttl=60, maxsize=1024)
+async def list_products(category: Optional[str] = None, q: Optional[str] = None, limit: int = 50):
     filter_dict = {"active": True}
+    sort = None
     if category:
         filter_dict["category"] = category
     if q:
-        filter_dict["$or"] = [
-            {"title": {"$regex": q, "$options": "i"}},
-            {"description": {"$regex": q, "$options": "i"}},
-            {"tags": {"$regex": q, "$options": "i"}},
-        ]
+        q = q.strip()
+        # 1-2 char queries (autocomplete keystrokes) match nearly every
+        # document; short-circuit instead of paying a near-full scan.
+        # Repeats of real searches are already absorbed by the TTL cache.
+        if len(q.lstrip("*")) < 3:
+            return []
+        if q.startswith("*"):
+            # Text search can't serve leading-wildcard queries; keep the regex
+            # fallback with a single escaped pattern shared across clauses so
+            # user input can't inject pathological regex syntax
+            pattern = Regex(re.escape(q.lstrip("*")), "i")
+            filter_dict["$or"] = [
+                {"title": pattern},
+                {"description": pattern},
+                {"tags": pattern},
+            ]
+        elif " " not in q:
+            # Single token: equality match on the precomputed lowercased
+            # token array, a plain index seek
+            filter_dict["search_tokens"] = q.lower()
+        else:
+            filter_dict["$text"] = {"$search": q}
+            sort = [("score", {"$meta": "textScore"})]
     try:
-        docs = get_documents("product", filter_dict, limit)
-        # coerce to Product-serializable
-        for d in docs:
-            d.pop("_id", None)
-        return docs
+        if limit > STREAM_THRESHOLD:
+            return stream_json_array(stream_documents("product", filter_dict, limit, sort=sort, projection=PRODUCT_LIST_PROJECTION))
+        docs = await coalescer.fetch("product", filter_dict, limit, sort=sort, projection=PRODUCT_LIST_PROJECTION)
+        return PRODUCT_LIST.dump_python(PRODUCT_LIST.validate_python(docs), exclude_unset=True)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/products", status_code=201)
-def create_product(product: Product):
+async def create_product(product: Product):
     try:
-        _id = create_document("product", product)
+        # Tokenize at write time so searches hit an index equality match
+        if not product.search_tokens:
+            product.search_tokens = product_search_tokens(product.title, product.description, product.tags)
+        _id = await create_document("product", product)
+        list_products.invalidate()
+        recommend_for_sku.invalidate()
         return {"id": _id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -57,109 +171,136 @@ class CreateOrderRequest(BaseModel):
     promo_code: Optional[str] = None
 
 @app.post("/api/orders", status_code=201)
-def create_order(req: CreateOrderRequest):
-    order = req.order.model_dump()
-    # Apply promo code if exists
+async def create_order(req: CreateOrderRequest):
+    order = req.order.model_dump(exclude_none=True)
+    # Apply promo code if exists; the discount is computed server-side in the
+    # same command that reads the promo, so the amount can't race a concurrent
+    # promo edit between fetch and compute
     if req.promo_code:
-        promos = get_documents("promocode", {"code": req.promo_code, "active": True}, 1)
+        promos = await aggregate("promocode", [
+            {"$match": {"code": req.promo_code, "active": True}},
+            {"$project": {
+                "_id": 0,
+                "discount": {"$round": [{"$add": [
+                    {"$ifNull": ["$amount_off", 0]},
+                    {"$multiply": [order["subtotal"], {"$divide": [{"$ifNull": ["$percent_off", 0]}, 100]}]},
+                ]}, 2]},
+            }},
+        ], 1)
         if promos:
-            promo = promos[0]
-            percent = promo.get("percent_off")
-            amount = promo.get("amount_off")
-            if percent:
-                order["discount"] = order.get("discount", 0) + round(order["subtotal"] * percent / 100, 2)
-            if amount:
-                order["discount"] = order.get("discount", 0) + amount
+            order["discount"] = order.get("discount", 0) + promos[0]["discount"]
             order["total"] = max(0, round(order["subtotal"] + order["shipping_cost"] - order.get("discount", 0), 2))
-    _id = create_document("order", order)
+    _id = await create_document("order", order)
     # For MVP, simulate PayPal by returning a fake order id
     paypal_order_id = f"SIM-PAYPAL-{_id}"
     return {"id": _id, "paypal_order_id": paypal_order_id}
 
 @app.get("/api/orders/track/{order_id}")
-def track_order(order_id: str):
-    docs = get_documents("order", {"_id": {"$regex": order_id}}, 1)
-    if not docs:
+async def track_order(order_id: str):
+    # Anchored prefix regex so the lookup can seek the _id index instead of scanning
+    doc = await find_one("order", {"_id": {"$regex": f"^{re.escape(order_id)}"}}, projection={"_id": 0})
+    if not doc:
         raise HTTPException(status_code=404, detail="Order not found")
-    doc = docs[0]
-    doc.pop("_id", None)
     return doc
 
 # --------- Wishlist ---------
 
 @app.post("/api/wishlist")
-def save_wishlist(w: Wishlist):
-    _id = create_document("wishlist", w)
+async def save_wishlist(w: Wishlist):
+    _id = await writer.insert("wishlist", w)
     return {"id": _id}
 
 # --------- Marketing ---------
 
 @app.post("/api/newsletter")
-def subscribe_newsletter(n: Newsletter):
-    _id = create_document("newsletter", n)
+async def subscribe_newsletter(n: Newsletter):
+    _id = await writer.insert("newsletter", n)
     return {"id": _id}
 
 # --------- Blog & Events ---------
 
-@app.get("/api/blog", response_model=List[BlogPost])
-def list_blog(limit: int = 20):
-    docs = get_documents("blogpost", {"published": True}, limit)
-    for d in docs:
-        d.pop("_id", None)
-    return docs
+@app.get("/api/blog")
+@ttl_cache(ttl=60, maxsize=1024)
+async def list_blog(limit: int = 20):
+    if limit > STREAM_THRESHOLD:
+        return stream_json_array(stream_documents("blogpost", {"published": True}, limit, projection=BLOG_LIST_PROJECTION))
+    docs = await coalescer.fetch("blogpost", {"published": True}, limit, projection=BLOG_LIST_PROJECTION)
+    return BLOG_LIST.dump_python(BLOG_LIST.validate_python(docs), exclude_unset=True)
 
 @app.post("/api/blog")
-def create_blog(p: BlogPost):
-    _id = create_document("blogpost", p)
+async def create_blog(p: BlogPost):
+    _id = await create_document("blogpost", p)
+    list_blog.invalidate()
     return {"id": _id}
 
-@app.get("/api/events", response_model=List[Event])
-def list_events(limit: int = 50):
-    docs = get_documents("event", {}, limit)
-    for d in docs:
-        d.pop("_id", None)
-    return docs
+@app.get("/api/events")
+@ttl_cache(ttl=60, maxsize=1024)
+async def list_events(limit: int = 50):
+    if limit > STREAM_THRESHOLD:
+        return stream_json_array(stream_documents("event", {}, limit, projection=EVENT_LIST_PROJECTION))
+    docs = await coalescer.fetch("event", {}, limit, projection=EVENT_LIST_PROJECTION)
+    return EVENT_LIST.dump_python(EVENT_LIST.validate_python(docs), exclude_unset=True)
 
 @app.post("/api/events")
-def create_event(e: Event):
-    _id = create_document("event", e)
+async def create_event(e: Event):
+    _id = await create_document("event", e)
+    list_events.invalidate()
     return {"id": _id}
 
 # --------- AI Recommendations (simple content-based MVP) ---------
 
 @app.get("/api/recommendations/{sku}")
-def recommend_for_sku(sku: str, limit: int = 8):
-    # Use shared tags/brand/category for simple recommendations
-    prod_docs = get_documents("product", {"sku": sku}, 1)
-    if not prod_docs:
+@ttl_cache(ttl=60, maxsize=1024)
+async def recommend_for_sku(sku: str, limit: int = 8):
+    # The product and similarity lookups are independent; run them in
+    # parallel so the endpoint pays max(RTT) instead of sum(RTT)
+    p, entry = await asyncio.gather(
+        find_one("product", {"sku": sku}),
+        find_one("sku_similar", {"sku": sku}),
+    )
+    if not p:
         raise HTTPException(status_code=404, detail="Product not found")
-    p = prod_docs[0]
-    tags = p.get("tags", [])
-    brand = p.get("brand")
-    category = p.get("category")
-    query = {"active": True, "sku": {"$ne": sku}, "$or": []}
-    if tags:
-        query["$or"].append({"tags": {"$in": tags}})
-    if brand:
-        query["$or"].append({"brand": brand})
-    if category:
-        query["$or"].append({"category": category})
-    if not query["$or"]:
-        query.pop("$or")
-    recs = get_documents("product", query, limit)
-    for r in recs:
-        r.pop("_id", None)
+    # Serve from the precomputed item-item similarity table when available
+    if entry and entry.get("similar"):
+        similar = entry["similar"][:limit]
+        recs = await get_documents("product", {"sku": {"$in": similar}, "active": True}, limit)
+        rank = {s: i for i, s in enumerate(similar)}
+        recs.sort(key=lambda r: rank.get(r.get("sku"), len(rank)))
+    else:
+        # Cold start: fall back to shared tags/brand/category on the fly
+        tags = p.get("tags", [])
+        brand = p.get("brand")
+        category = p.get("category")
+        query = {"active": True, "sku": {"$ne": sku}, "$or": []}
+        if tags:
+            query["$or"].append({"tags": {"$in": tags}})
+        if brand:
+            query["$or"].append({"brand": brand})
+        if category:
+            query["$or"].append({"category": category})
+        if not query["$or"]:
+            query.pop("$or")
+        recs = await get_documents("product", query, limit)
     return {"items": recs}
 
 @app.post("/api/recommendations/feedback")
-def recommendation_feedback(f: RecommendationFeedback):
-    _id = create_document("recommendationfeedback", f)
+async def recommendation_feedback(f: RecommendationFeedback):
+    _id = await writer.insert("recommendationfeedback", f)
     return {"id": _id}
 
 # --------- Health & Schema Info ---------
 
+@ttl_cache(ttl=30)
+async def _collections():
+    return await db.list_collection_names()
+
+@app.get("/healthz")
+async def healthz():
+    # Liveness probe: no DB round-trip, point k8s-style probes here
+    return {"status": "ok"}
+
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -175,7 +316,7 @@ def test_database():
             response["database_name"] = db.name
             response["connection_status"] = "Connected"
             try:
-                collections = db.list_collection_names()
+                collections = await _collections()
                 response["collections"] = collections[:10]
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
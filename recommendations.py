@@ -0,0 +1,68 @@
+"""
+Recommendation Precompute
+
+Builds an item-item similarity table offline so /api/recommendations can
+serve a single keyed lookup instead of re-running a multi-predicate
+product scan per request. Similarity is Jaccard over tag sets plus
+brand/category overlap, refreshed periodically in the background.
+"""
+
+import asyncio
+import logging
+
+from pymongo import ReplaceOne
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+TOP_K = 24
+REFRESH_SECONDS = 3600
+
+def _similarity(a: dict, b: dict) -> float:
+    """Score two products by shared tags, brand, and category"""
+    tags_a = set(a.get("tags") or [])
+    tags_b = set(b.get("tags") or [])
+    union = tags_a | tags_b
+    score = len(tags_a & tags_b) / len(union) if union else 0.0
+    if a.get("brand") and a.get("brand") == b.get("brand"):
+        score += 0.5
+    if a.get("category") and a.get("category") == b.get("category"):
+        score += 0.25
+    return score
+
+async def rebuild_similarity(top_k: int = TOP_K):
+    """Recompute top-K similar SKUs per product into the sku_similar collection"""
+    if db is None:
+        return
+    products = await db.product.find(
+        {"active": True},
+        {"_id": 0, "sku": 1, "tags": 1, "brand": 1, "category": 1},
+    ).to_list(None)
+    ops = []
+    for p in products:
+        scored = [
+            (_similarity(p, other), other["sku"])
+            for other in products
+            if other["sku"] != p["sku"]
+        ]
+        scored = [s for s in scored if s[0] > 0]
+        scored.sort(key=lambda s: s[0], reverse=True)
+        ops.append(ReplaceOne(
+            {"sku": p["sku"]},
+            {"sku": p["sku"], "similar": [sku for _, sku in scored[:top_k]]},
+            upsert=True,
+        ))
+    if ops:
+        await db.sku_similar.bulk_write(ops, ordered=False)
+
+async def similarity_refresher():
+    """Background loop keeping the similarity table fresh"""
+    while True:
+        try:
+            await rebuild_similarity()
+        except Exception:
+            # Keep the refresher alive, but leave a trace: a permanently
+            # failing rebuild means recommendations silently go stale
+            logger.exception("Similarity rebuild failed; serving stale recommendations")
+        await asyncio.sleep(REFRESH_SECONDS)
@@ -5,13 +5,16 @@ Define MongoDB collection schemas using Pydantic models.
 Each Pydantic model represents a collection (lowercased class name).
 """
 from __future__ import annotations
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, ConfigDict, Field, EmailStr
 from typing import Optional, List, Literal, Dict
 from datetime import datetime
+import re
 
 # ---------- Core Domain Schemas ----------
 
 class Product(BaseModel):
+    model_config = ConfigDict(from_attributes=True, extra="ignore")
+
     sku: str = Field(..., description="Stock keeping unit, unique")
     title: str
     description: Optional[str] = None
@@ -26,6 +29,16 @@ class Product(BaseModel):
     fulfillment: Literal["self", "third_party"] = Field(default="self")
     eco_score: Optional[int] = Field(None, ge=1, le=5)
     active: bool = Field(default=True)
+    search_tokens: List[str] = Field(default_factory=list, description="Lowercased tokens for indexed case-insensitive search")
+
+def product_search_tokens(title: str, description: Optional[str] = None, tags: Optional[List[str]] = None) -> List[str]:
+    """Unique lowercased words from a product's searchable text fields.
+
+    Called on the write path only; read-path validation must not recompute
+    (or re-expose) tokens from projected documents.
+    """
+    text = " ".join(filter(None, [title, description, " ".join(tags or [])]))
+    return sorted({w.lower() for w in re.findall(r"\w+", text)})
 
 class CartItem(BaseModel):
     sku: str
@@ -45,6 +58,8 @@ class ShippingAddress(BaseModel):
     phone: Optional[str] = None
 
 class Order(BaseModel):
+    model_config = ConfigDict(from_attributes=True, extra="ignore")
+
     user_id: Optional[str] = None
     email: Optional[EmailStr] = None
     items: List[CartItem]
@@ -73,6 +88,8 @@ class PromoCode(BaseModel):
     active: bool = True
 
 class BlogPost(BaseModel):
+    model_config = ConfigDict(from_attributes=True, extra="ignore")
+
     title: str
     slug: str
     content: str
@@ -82,6 +99,8 @@ class BlogPost(BaseModel):
     created_at: Optional[datetime] = None
 
 class Event(BaseModel):
+    model_config = ConfigDict(from_attributes=True, extra="ignore")
+
     title: str
     date: datetime
     location: str
@@ -0,0 +1,94 @@
+"""
+Batched Writes
+
+Buffers single-document inserts and flushes them with insert_many so
+bursty POST traffic amortizes the per-write round-trip. Callers get an
+immediate ack: _id is assigned client-side before the batch flush.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pydantic import BaseModel
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH = 100
+MAX_WAIT_MS = 25
+
+class BatchWriter:
+    def __init__(self, max_batch: int = MAX_BATCH, max_wait_ms: int = MAX_WAIT_MS):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = None
+        self._task = None
+
+    def _ensure_started(self):
+        # Lazily start the flusher on the running loop (there is none at import time)
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def insert(self, collection_name: str, data):
+        """Queue a document for batched insert and return its id immediately"""
+        if db is None:
+            raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+        if isinstance(data, BaseModel):
+            doc = data.model_dump()
+        else:
+            doc = data.copy()
+        doc['_id'] = ObjectId()
+        doc['created_at'] = datetime.now(timezone.utc)
+        doc['updated_at'] = datetime.now(timezone.utc)
+
+        self._ensure_started()
+        await self._queue.put((collection_name, doc))
+        return str(doc['_id'])
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._insert_batch(batch)
+
+    async def _insert_batch(self, batch):
+        groups = {}
+        for collection_name, doc in batch:
+            groups.setdefault(collection_name, []).append(doc)
+        for collection_name, docs in groups.items():
+            try:
+                await db[collection_name].insert_many(docs, ordered=False)
+            except Exception:
+                # Callers were already acked, so a dropped batch is data
+                # loss: log it loudly, but never kill the writer loop
+                logger.exception(
+                    "Batched insert of %d document(s) into %r failed; acked writes were lost",
+                    len(docs), collection_name,
+                )
+
+    async def flush(self):
+        """Drain and insert everything still queued (call before shutdown)"""
+        if self._queue is None:
+            return
+        batch = []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        if batch:
+            await self._insert_batch(batch)
+
+writer = BatchWriter()